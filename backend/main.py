@@ -1,29 +1,57 @@
 # main.py
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi import FastAPI, Depends, HTTPException, status, Request, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse  # Add this import
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from fastapi.responses import JSONResponse, ORJSONResponse  # Add this import
+import jwt
+from jwt import InvalidTokenError
+import bcrypt
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field
-from datetime import datetime, timedelta
+from pydantic import BaseModel, ConfigDict, Field, conlist
+from datetime import date, datetime, timedelta
+from contextlib import asynccontextmanager
+import asyncio
 import os
-import traceback
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, ForeignKey
+import hashlib
+import json
+import logging
+import threading
+import time
+from cachetools import TTLCache
+from sqlalchemy import create_engine, insert, make_url, select, Column, Integer, String, Float, Date, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, Session
-import dropbox
+import httpx
+import pandas as pd
 from openpyxl import load_workbook
 from openpyxl.styles import Alignment, Border, Side
-import tempfile
+from io import BytesIO
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start the Dropbox sync worker; on shutdown let it flush what's queued
+    global dropbox_sync_queue, dropbox_client
+    dropbox_client = httpx.AsyncClient(
+        headers={"Authorization": f"Bearer {DROPBOX_ACCESS_TOKEN}"},
+        limits=httpx.Limits(max_connections=DROPBOX_MAX_CONNECTIONS),
+        timeout=DROPBOX_TIMEOUT_SECONDS,
+    )
+    dropbox_sync_queue = asyncio.Queue()
+    worker = asyncio.create_task(dropbox_sync_worker(dropbox_sync_queue))
+    yield
+    await dropbox_sync_queue.put(None)
+    await worker
+    await dropbox_client.aclose()
+
 # FastAPI app
-app = FastAPI(title="Investment Scorecard API")
+app = FastAPI(title="Investment Scorecard API", lifespan=lifespan)
 
 # CORS setup - Fix the CORS issue
 app.add_middleware(
@@ -38,23 +66,63 @@ app.add_middleware(
 # JWT Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key")
 ALGORITHM = "HS256"
+# Encoded once so signing and verifying don't re-encode the key per token
+JWT_KEY = SECRET_KEY.encode()
+JWT_ALGORITHMS = [ALGORITHM]
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # Token URL
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Verified-token cache: sha256(token) -> (user, exp). Only tokens that decoded
+# and resolved to a user are stored, and entries never outlive the token itself.
+TOKEN_CACHE_TTL_SECONDS = 5
+token_cache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL_SECONDS)
+token_cache_lock = threading.Lock()
+
 # Database setup
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./scorecard.db")
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+database_url = make_url(SQLALCHEMY_DATABASE_URL)
+# Check connections before use and recycle them before server-side idle timeouts drop them
+engine_options = {
+    "pool_pre_ping": True,
+    "pool_recycle": 1800,
+}
+if database_url.get_backend_name() == "sqlite":
+    # Pooled connections move between threadpool threads
+    engine_options["connect_args"] = {"check_same_thread": False}
+# In-memory SQLite uses SingletonThreadPool, which takes no sizing; everything
+# else gets a QueuePool sized for the threadpool that runs sync handlers
+is_memory_sqlite = database_url.get_backend_name() == "sqlite" and (
+    database_url.database in (None, "", ":memory:")
+    or database_url.query.get("mode") == "memory"
+)
+if not is_memory_sqlite:
+    engine_options["pool_size"] = 20
+    engine_options["max_overflow"] = 40
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 # Dropbox configuration
 DROPBOX_ACCESS_TOKEN = os.getenv("DROPBOX_ACCESS_TOKEN")
+DROPBOX_EXCEL_PATH = "/scorecards.xlsx"
+DROPBOX_DOWNLOAD_URL = "https://content.dropboxapi.com/2/files/download"
+DROPBOX_UPLOAD_URL = "https://content.dropboxapi.com/2/files/upload"
+DROPBOX_MAX_CONNECTIONS = 20
+DROPBOX_TIMEOUT_SECONDS = 30
+
+# One async HTTP client per process, opened in lifespan, so Dropbox calls reuse
+# pooled, kept-alive connections and never block the event loop
+dropbox_client: Optional[httpx.AsyncClient] = None
+
+# Lists of scorecards waiting to be written to the Dropbox workbook. The worker syncs
+# once it has DROPBOX_SYNC_MAX_BATCH items or DROPBOX_SYNC_MAX_WAIT_SECONDS pass; a
+# single list, such as a bulk import, always goes out in one sync.
+DROPBOX_SYNC_MAX_BATCH = 20
+DROPBOX_SYNC_MAX_WAIT_SECONDS = 5
+dropbox_sync_queue: Optional[asyncio.Queue] = None
 
 # Database Models
 class User(Base):
@@ -90,6 +158,15 @@ class Scorecard(Base):
 # Create tables
 Base.metadata.create_all(bind=engine)
 
+# Distinct sectors / company names for the form dropdowns. They only change when a
+# scorecard is added, so score_company drops the entries after each insert.
+LOOKUP_CACHE_TTL_SECONDS = 60
+lookup_cache = TTLCache(maxsize=2, ttl=LOOKUP_CACHE_TTL_SECONDS)
+lookup_cache_lock = threading.Lock()
+# Bumped on every invalidation so a query that started before an insert can't
+# store its stale result after the cache was cleared
+lookup_cache_generation = 0
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
@@ -122,16 +199,15 @@ class UserLogin(UserBase):
 class UserResponse(UserBase):
     first_name: str
     last_name: str
-    
-    class Config:
-        orm_mode = True
+
+    model_config = ConfigDict(from_attributes=True)
 
 class AuthStatus(BaseModel):
     isAuthenticated: bool
     user: Optional[UserResponse] = None
 
 class ScoreBase(BaseModel):
-    date: str
+    date: date
     company_name: str
     sector: str
     investment_stage: str
@@ -142,10 +218,10 @@ class ScoreBase(BaseModel):
     potential_return: int = Field(..., ge=0, le=10)
     bold_excitement: int = Field(..., ge=0, le=10)
 
-# Modified ScoreResponse to handle nested scores correctly
+# ScoreResponse carries the individual scores at the top level
 class ScoreResponse(BaseModel):
     id: int
-    date: str
+    date: date
     company_name: str
     sector: str
     investment_stage: str
@@ -157,20 +233,21 @@ class ScoreResponse(BaseModel):
     bold_excitement: int
     score: float
     scored_by: Dict[str, str]
-    scores: Dict[str, int]
-    
-    class Config:
-        orm_mode = True
+
+    model_config = ConfigDict(from_attributes=True)
+
+# Upper bound on scorecards accepted by one bulk import request
+BULK_SCORECARD_LIMIT = 500
 
 class RefreshToken(BaseModel):
     refresh_token: str
 
 # Helper functions
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
 
 def get_user(db: Session, username: str):
     return db.query(User).filter(User.username == username).first()
@@ -190,14 +267,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, JWT_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 def create_refresh_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, JWT_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 def generate_jwt_tokens(user):
@@ -212,23 +289,34 @@ def generate_jwt_tokens(user):
         "token_type": "bearer"
     }
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    cache_key = hashlib.sha256(token.encode()).digest()
+    with token_cache_lock:
+        cached = token_cache.get(cache_key)
+    if cached is not None:
+        user, exp = cached
+        if exp is None or exp > time.time():
+            return user
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, JWT_KEY, algorithms=JWT_ALGORITHMS)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
         token_data = TokenData(username=username)
-    except JWTError:
+    except InvalidTokenError:
         raise credentials_exception
     user = get_user(db, username=token_data.username)
     if user is None:
         raise credentials_exception
+    # Detach the user so commits in later sessions can't expire the cached copy
+    db.expunge(user)
+    with token_cache_lock:
+        token_cache[cache_key] = (user, payload.get("exp"))
     return user
 
 def validate_registration_fields(username, password, retype_password, firstname, lastname):
@@ -267,60 +355,100 @@ def validate_scorecard_fields(date, company_name, sector, investment_stage, alig
         return "Bold_excitement is required."
     return None
 
+def get_distinct_values(db: Session, cache_key: str, column):
+    with lookup_cache_lock:
+        values = lookup_cache.get(cache_key)
+        generation = lookup_cache_generation
+    if values is None:
+        values = [row[0] for row in db.query(column).distinct().all() if row[0]]
+        with lookup_cache_lock:
+            if generation == lookup_cache_generation:
+                lookup_cache[cache_key] = values
+    return values
+
+def invalidate_lookup_cache():
+    global lookup_cache_generation
+    with lookup_cache_lock:
+        lookup_cache_generation += 1
+        lookup_cache.clear()
+
 def get_score(alignment, team, market, product, potential_return, bold_excitement):
     score = (alignment + market + product + bold_excitement) * (team + potential_return) / 80.00
     return round(score, 2)
 
+def bulk_create_scorecards(db: Session, items: List[Dict[str, Any]]):
+    """Inserts scorecard rows with one executemany INSERT and returns their IDs in order.
+
+    Skips the per-object unit of work; the caller commits.
+    """
+    # An executemany with no parameter sets would run as a bare INSERT of one NULL row
+    if not items:
+        return []
+    # Ordered RETURNING needs SQLite 3.35+ (or Postgres); older SQLite builds fall
+    # back to the ORM, which still batches the INSERTs in one flush
+    if not db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        scorecards = [Scorecard(**item) for item in items]
+        db.add_all(scorecards)
+        db.flush()
+        return [scorecard.id for scorecard in scorecards]
+    return db.scalars(
+        insert(Scorecard).returning(Scorecard.id, sort_by_parameter_order=True),
+        items
+    ).all()
+
+def is_dropbox_configured():
+    return bool(DROPBOX_ACCESS_TOKEN) and DROPBOX_ACCESS_TOKEN != 'your-dropbox-access-token-here'
+
 # Excel and Dropbox Functions
-def fetch_excel_from_dropbox(dropbox_path, local_path):
-    """Fetches an Excel file from Dropbox and saves it locally."""
-    dbx = dropbox.Dropbox(DROPBOX_ACCESS_TOKEN)
-    print(f"Token being used: '{DROPBOX_ACCESS_TOKEN}'")
-    with open(local_path, "wb") as f:
-        metadata, res = dbx.files_download(path=dropbox_path)
-        f.write(res.content)
-    print(f"File successfully fetched from Dropbox to: {local_path}")
-    return local_path
-
-def append_and_format_to_excel(file_path, scorecard):
-    """Appends a new scorecard row to the Excel file with grouped companies and their average score."""
-    workbook = load_workbook(file_path)
+async def fetch_excel_from_dropbox(dropbox_path):
+    """Fetches an Excel file from Dropbox into memory."""
+    res = await dropbox_client.post(
+        DROPBOX_DOWNLOAD_URL,
+        headers={"Dropbox-API-Arg": json.dumps({"path": dropbox_path})},
+    )
+    res.raise_for_status()
+    logger.info("File successfully fetched from Dropbox: %s", dropbox_path)
+    return BytesIO(res.content)
+
+def load_scorecard_frame():
+    """Reads every scorecard with its scorer's name from the database as columns, in insertion order."""
+    query = (
+        select(
+            User.first_name,
+            User.last_name,
+            Scorecard.company_name,
+            Scorecard.date,
+            Scorecard.sector,
+            Scorecard.investment_stage,
+            Scorecard.alignment,
+            Scorecard.team,
+            Scorecard.market,
+            Scorecard.product,
+            Scorecard.potential_return,
+            Scorecard.bold_excitement,
+            Scorecard.score,
+        )
+        .join(User, Scorecard.user_id == User.id)
+        .order_by(Scorecard.id)
+    )
+    with engine.connect() as connection:
+        df = pd.read_sql(query, connection)
+    df.insert(0, "name", df.pop("first_name") + " " + df.pop("last_name"))
+    return df
+
+def rebuild_scorecard_sheet(excel_file, df):
+    """Rewrites the active sheet from the scorecard frame, grouped by company with their average score.
+
+    The header row and every other worksheet are left untouched. Returns the
+    saved workbook as a new in-memory file.
+    """
+    workbook = load_workbook(excel_file)
     sheet = workbook.active
 
-    name = f"{scorecard['scored_by']['first_name']} {scorecard['scored_by']['last_name']}"
-    
-    # Create the new row
-    new_row = [
-        name,
-        scorecard["company_name"],
-        scorecard["date"],
-        scorecard["sector"],
-        scorecard["investment_stage"],
-        scorecard["scores"]["alignment"],
-        scorecard["scores"]["team"],
-        scorecard["scores"]["market"],
-        scorecard["scores"]["product"],
-        scorecard["scores"]["potential_return"],
-        scorecard["scores"]["bold_excitement"],
-        scorecard["score"]
-    ]
-
-    # Append the new row
-    sheet.append(new_row)
-
-    # Read all rows
-    rows = list(sheet.iter_rows(values_only=True))
-    header = rows[0]
-    data = rows[1:]
-
-    # Group rows by company name
-    grouped_data = {}
-    for row in data:
-        company_name = row[1]  # Assuming Company Name is column B
-        if company_name:
-            grouped_data.setdefault(company_name, []).append(row)
-
-    # Clear rows below the header
+    # Clear the rows written by the previous sync, keeping the header
+    for merged in list(sheet.merged_cells.ranges):
+        if merged.min_row > 1:
+            sheet.unmerge_cells(str(merged))
     if sheet.max_row > 1:
         sheet.delete_rows(2, sheet.max_row - 1)
 
@@ -335,74 +463,123 @@ def append_and_format_to_excel(file_path, scorecard):
         top=Side(style="thick"),
         bottom=Side(style="thick")
     )
-
-    # Write grouped data back with formatting
-    for company, rows in grouped_data.items():
-        scoreSum = 0
-        count = 0
-        if rows:  # Only process non-empty groups
-            for row in rows:
-                sheet.append(row)
-                scoreSum += row[11]  # Assuming 'Score' column is at index 11
-                count += 1
-
-            # Calculate average score
-            avg_score = round(scoreSum / count, 2) if count > 0 else 0
-
-            # Get the row index for "Total Score"
-            total_score_row = sheet.max_row + 1
-            score_col = len(header)  # Last column (score column)
-            label_col = score_col - 1  # Column before score
-
-            # Merge cells for "Total Score"
-            sheet.merge_cells(start_row=total_score_row, start_column=label_col, 
-                              end_row=total_score_row, end_column=score_col - 1)
-
-            # Set "Total Score" text
-            total_score_cell = sheet.cell(row=total_score_row, column=label_col)
-            total_score_cell.value = "Total Score"
-            total_score_cell.alignment = Alignment(horizontal="center", vertical="center")
-            total_score_cell.border = border_style_1  # Apply border
-
-            # Set total score value in the last column
-            score_cell = sheet.cell(row=total_score_row, column=score_col)
-            score_cell.value = avg_score
-            score_cell.alignment = Alignment(horizontal="center", vertical="center")
-            score_cell.border = border_style_2  # Apply border
-
-            # Append two blank rows after each company section
-            sheet.append([""] * len(header))
-
-    # Remove trailing blank rows
-    while all(cell.value is None for cell in sheet[sheet.max_row]):
-        sheet.delete_rows(sheet.max_row)
+    center = Alignment(horizontal="center", vertical="center")
+    score_col = len(df.columns)  # Last column (score column)
+    label_col = score_col - 1  # Column before score
+
+    df = df[df["company_name"].fillna("") != ""]
+    # The sheet has always stored dates as "YYYY-MM-DD" text; keep the whole column that type
+    df = df.assign(date=pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d"))
+    # Blank cells go out as None rather than NaN
+    cells = df.astype(object).where(df.notna(), None)
+
+    # Average score per company in one vectorized pass, companies in order of first appearance
+    groups = df.groupby("company_name", sort=False)
+    avg_scores = groups["score"].mean().round(2)
+
+    # Write grouped data with formatting
+    row_idx = 2
+    for company, avg_score in avg_scores.items():
+        for values in cells.loc[groups.groups[company]].itertuples(index=False, name=None):
+            for col_idx, value in enumerate(values, start=1):
+                sheet.cell(row=row_idx, column=col_idx, value=value)
+            row_idx += 1
+
+        total_score_cell = sheet.cell(row=row_idx, column=label_col, value="Total Score")
+        total_score_cell.alignment = center
+        total_score_cell.border = border_style_1
+
+        score_cell = sheet.cell(row=row_idx, column=score_col, value=float(avg_score))
+        score_cell.alignment = center
+        score_cell.border = border_style_2
+
+        # Leave a blank row after each company section
+        row_idx += 2
 
     # Format the header row
     for cell in sheet[1]:
-        cell.alignment = Alignment(horizontal="center", vertical="center")
+        cell.alignment = center
 
-    workbook.save(file_path)
+    output = BytesIO()
+    workbook.save(output)
     workbook.close()
-    print(f"Excel file updated and saved locally at: {file_path}")
-
-def upload_excel_to_dropbox(local_path, dropbox_path):
-    """Uploads an Excel file to Dropbox."""
-    dbx = dropbox.Dropbox(DROPBOX_ACCESS_TOKEN)
-    with open(local_path, "rb") as f:
-        res = dbx.files_upload(f.read(), path=dropbox_path, mode=dropbox.files.WriteMode.overwrite)
-    print(f"File successfully uploaded to Dropbox: {dropbox_path}")
+    return output
+
+async def upload_excel_to_dropbox(excel_file, dropbox_path):
+    """Uploads an in-memory Excel file to Dropbox."""
+    res = await dropbox_client.post(
+        DROPBOX_UPLOAD_URL,
+        headers={
+            "Dropbox-API-Arg": json.dumps({"path": dropbox_path, "mode": "overwrite"}),
+            "Content-Type": "application/octet-stream",
+        },
+        content=excel_file.getvalue(),
+    )
+    res.raise_for_status()
+    logger.info("File successfully uploaded to Dropbox: %s", dropbox_path)
     return f"Updated file uploaded to Dropbox at {dropbox_path}"
 
+async def sync_scorecards_to_dropbox(scorecards):
+    """Brings the Dropbox workbook up to date after a batch of scorecards, with one download and one upload."""
+    try:
+        # Step 1: Fetch file from Dropbox
+        logger.info("Fetching file from Dropbox: %s", DROPBOX_EXCEL_PATH)
+        excel_file = await fetch_excel_from_dropbox(DROPBOX_EXCEL_PATH)
+
+        # Step 2: Rebuild the scorecard sheet from the database, which is the source of truth.
+        # The query and the rewrite block, so keep them off the event loop
+        logger.info("Rebuilding the Excel file after %d new scorecard(s)...", len(scorecards))
+        df = await run_in_threadpool(load_scorecard_frame)
+        excel_file = await run_in_threadpool(rebuild_scorecard_sheet, excel_file, df)
+
+        # Step 3: Upload file back to Dropbox
+        logger.info("Uploading updated file to Dropbox: %s", DROPBOX_EXCEL_PATH)
+        message = await upload_excel_to_dropbox(excel_file, DROPBOX_EXCEL_PATH)
+        logger.info(message)
+    except Exception:
+        logger.exception("Dropbox operation failed")
+
+async def enqueue_scorecard_sync(scorecards):
+    """Queues scorecards for the next Dropbox sync batch."""
+    await dropbox_sync_queue.put(scorecards)
+
+async def dropbox_sync_worker(queue: asyncio.Queue):
+    """Drains the sync queue in batches until it receives None."""
+    loop = asyncio.get_running_loop()
+    while True:
+        scorecards = await queue.get()
+        if scorecards is None:
+            return
+        batch = list(scorecards)
+        stopping = False
+        deadline = loop.time() + DROPBOX_SYNC_MAX_WAIT_SECONDS
+        while len(batch) < DROPBOX_SYNC_MAX_BATCH:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                scorecards = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if scorecards is None:
+                stopping = True
+                break
+            batch.extend(scorecards)
+
+        await sync_scorecards_to_dropbox(batch)
+        if stopping:
+            return
+
 # API Routes
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    print(f"Unhandled exception: {exc}")
-    print(traceback.format_exc())
+    # Expected HTTP errors need no stack trace
     if isinstance(exc, HTTPException):
         return JSONResponse(
             status_code=exc.status_code,
             content={"error": exc.detail}
         )
+    logger.error("Unhandled exception: %s", exc, exc_info=exc)
     return JSONResponse(
         status_code=500,
         content={"error": f"Internal server error: {str(exc)}"}
@@ -418,7 +595,7 @@ async def options_score_company():
     })
 
 @app.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     user = authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -430,7 +607,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     return tokens
 
 @app.post("/api/login/", response_model=Token)
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
+def login(user_data: UserLogin, db: Session = Depends(get_db)):
     user = authenticate_user(db, user_data.username, user_data.password)
     if not user:
         raise HTTPException(
@@ -441,7 +618,7 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
     return tokens
 
 @app.post("/api/register/", response_model=Dict[str, Any])
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+def register(user_data: UserCreate, db: Session = Depends(get_db)):
     # Validate fields
     validation_error = validate_registration_fields(
         user_data.username, 
@@ -479,9 +656,9 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     }
 
 @app.post("/api/refresh-token/", response_model=Token)
-async def refresh_token(refresh_token_data: RefreshToken, db: Session = Depends(get_db)):
+def refresh_token(refresh_token_data: RefreshToken, db: Session = Depends(get_db)):
     try:
-        payload = jwt.decode(refresh_token_data.refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(refresh_token_data.refresh_token, JWT_KEY, algorithms=JWT_ALGORITHMS)
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(
@@ -499,7 +676,7 @@ async def refresh_token(refresh_token_data: RefreshToken, db: Session = Depends(
         tokens = generate_jwt_tokens(user)
         return tokens
         
-    except JWTError:
+    except InvalidTokenError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid refresh token",
@@ -524,14 +701,13 @@ async def logout(current_user: User = Depends(get_current_user)):
     }
 
 @app.post("/api/score-company/", response_model=ScoreResponse)
-async def score_company(
+def score_company(
     score_data: ScoreBase, 
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     try:
-        print(f"Received score data: {score_data}")
-        
         # Calculate score
         score = get_score(
             score_data.alignment,
@@ -542,21 +718,19 @@ async def score_company(
             score_data.bold_excitement
         )
         
-        # Create scorecard data for Excel
+        # Create scorecard data for Excel and the response
         scorecard = {
-            "id": 1,  # Mock ID for Excel processing
+            "id": 1,  # Mock ID until the database assigns one
             "date": score_data.date,
             "company_name": score_data.company_name,
             "sector": score_data.sector,
             "investment_stage": score_data.investment_stage,
-            "scores": {
-                "alignment": score_data.alignment,
-                "team": score_data.team,
-                "market": score_data.market,
-                "product": score_data.product,
-                "potential_return": score_data.potential_return,
-                "bold_excitement": score_data.bold_excitement,
-            },
+            "alignment": score_data.alignment,
+            "team": score_data.team,
+            "market": score_data.market,
+            "product": score_data.product,
+            "potential_return": score_data.potential_return,
+            "bold_excitement": score_data.bold_excitement,
             "score": score,
             "scored_by": {
                 "first_name": current_user.first_name,
@@ -567,7 +741,7 @@ async def score_company(
         # Save to database
         try:
             db_scorecard = Scorecard(
-                date=datetime.strptime(score_data.date, "%Y-%m-%d").date(),
+                date=score_data.date,
                 company_name=score_data.company_name,
                 sector=score_data.sector,
                 investment_stage=score_data.investment_stage,
@@ -582,136 +756,160 @@ async def score_company(
             )
             
             db.add(db_scorecard)
-            db.commit()
-            db.refresh(db_scorecard)
-            
-            # Update scorecard with database ID
+            # Flush to get the generated ID; reading it after commit would reload the row
+            db.flush()
             scorecard["id"] = db_scorecard.id
-            print("Successfully saved to database")
+            db.commit()
+            invalidate_lookup_cache()
         except Exception as db_error:
-            print(f"Database error: {str(db_error)}")
-            print(traceback.format_exc())
+            logger.exception("Database error")
             db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Database error: {str(db_error)}"
             )
 
-        # Handle Excel export to Dropbox if configured
-        if DROPBOX_ACCESS_TOKEN and DROPBOX_ACCESS_TOKEN != 'your-dropbox-access-token-here':
-            # Define paths for Dropbox
-            dropbox_path = "/scorecards.xlsx"
-            local_path = tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx").name
-
-            try:
-                # Step 1: Fetch file from Dropbox
-                print(f"Fetching file from Dropbox: {dropbox_path}")
-                fetch_excel_from_dropbox(dropbox_path, local_path)
-                print(f"File successfully fetched from Dropbox: {local_path}")
-
-                # Step 2: Update Excel file
-                print("Appending and formatting the Excel file...")
-                append_and_format_to_excel(local_path, scorecard)
-                print(f"Excel file updated at: {local_path}")
-
-                # Ensure file exists before upload
-                if not os.path.exists(local_path):
-                    print(f"File does not exist at {local_path}, aborting upload.")
-                    raise HTTPException(
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
-                        detail="Local file was not created properly"
-                    )
-
-                # Step 3: Upload file back to Dropbox
-                print(f"Uploading updated file to Dropbox: {dropbox_path}")
-                message = upload_excel_to_dropbox(local_path, dropbox_path)
-                print(message)
-            except Exception as dropbox_error:
-                print(f"Dropbox operation failed: {str(dropbox_error)}")
-                print(traceback.format_exc())
-                # Don't fail the entire operation if Dropbox fails
-                print("Continuing without Dropbox sync due to error")
-            finally:
-                # Clean up the local temporary file
-                if os.path.exists(local_path):
-                    os.unlink(local_path)
-                    print(f"Temporary file cleaned up: {local_path}")
+        # Queue the Excel export to Dropbox if configured; it runs after the response is sent
+        if is_dropbox_configured():
+            background_tasks.add_task(enqueue_scorecard_sync, [scorecard])
         else:
-            print("Dropbox token not configured. Skipping Excel export.")
-
-        # Return full scorecard response with individual scores at the top level
-        return {
-            "id": scorecard["id"],
-            "date": scorecard["date"],
-            "company_name": scorecard["company_name"],
-            "sector": scorecard["sector"],
-            "investment_stage": scorecard["investment_stage"],
-            # Individual scores at top level to match ScoreResponse model
-            "alignment": score_data.alignment,
-            "team": score_data.team,
-            "market": score_data.market,
-            "product": score_data.product,
-            "potential_return": score_data.potential_return,
-            "bold_excitement": score_data.bold_excitement,
-            "score": scorecard["score"],
-            "scored_by": scorecard["scored_by"],
-            # Also keep scores dict for backward compatibility if needed
-            "scores": scorecard["scores"]
-        }
+            logger.debug("Dropbox token not configured. Skipping Excel export.")
+
+        # The scorecard already has the ScoreResponse shape
+        return scorecard
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error in score_company endpoint: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in score_company endpoint")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Server error: {str(e)}"
         )
 
+@app.post("/api/score-companies/bulk/", response_model=List[ScoreResponse])
+def bulk_score_companies(
+    scores_data: conlist(ScoreBase, min_length=1, max_length=BULK_SCORECARD_LIMIT),
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Imports many scorecards at once, e.g. when replaying an exported sheet.
+
+    Up to BULK_SCORECARD_LIMIT rows go in with a single INSERT and a single Dropbox sync.
+    """
+    items = [
+        {
+            **score_data.model_dump(),
+            "score": get_score(
+                score_data.alignment,
+                score_data.team,
+                score_data.market,
+                score_data.product,
+                score_data.potential_return,
+                score_data.bold_excitement
+            ),
+            "user_id": current_user.id,
+        }
+        for score_data in scores_data
+    ]
+
+    try:
+        ids = bulk_create_scorecards(db, items)
+        db.commit()
+    except Exception as db_error:
+        logger.exception("Database error")
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(db_error)}"
+        )
+    invalidate_lookup_cache()
+
+    scored_by = {
+        "first_name": current_user.first_name,
+        "last_name": current_user.last_name,
+    }
+    scorecards = [
+        {
+            **score_data.model_dump(),
+            "id": id_,
+            "score": item["score"],
+            "scored_by": scored_by,
+        }
+        for id_, score_data, item in zip(ids, scores_data, items)
+    ]
+
+    if is_dropbox_configured():
+        background_tasks.add_task(enqueue_scorecard_sync, scorecards)
+    return scorecards
+
 @app.get("/api/sectors/", response_model=List[str])
-async def get_sectors(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    sectors = db.query(Scorecard.sector).distinct().all()
-    return [sector[0] for sector in sectors if sector[0]]
+def get_sectors(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    return get_distinct_values(db, "sectors", Scorecard.sector)
 
 @app.get("/api/company-names/", response_model=List[str])
-async def get_company_names(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    company_names = db.query(Scorecard.company_name).distinct().all()
-    return [name[0] for name in company_names if name[0]]
-
-@app.get("/api/scored-companies/", response_model=List[ScoreResponse])
-async def get_scored_companies(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    scorecards = db.query(Scorecard).join(User).all()
-    
-    response_data = []
-    for scorecard in scorecards:
-        response_data.append({
-            "id": scorecard.id,
-            "date": str(scorecard.date),
-            "company_name": scorecard.company_name,
-            "sector": scorecard.sector,
-            "investment_stage": scorecard.investment_stage,
+def get_company_names(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    return get_distinct_values(db, "company_names", Scorecard.company_name)
+
+@app.get("/api/scored-companies/", response_model=List[ScoreResponse], response_class=ORJSONResponse)
+def get_scored_companies(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    # Select only the columns the response needs; rows come back as plain tuples
+    rows = db.query(
+        Scorecard.id,
+        Scorecard.date,
+        Scorecard.company_name,
+        Scorecard.sector,
+        Scorecard.investment_stage,
+        Scorecard.alignment,
+        Scorecard.team,
+        Scorecard.market,
+        Scorecard.product,
+        Scorecard.potential_return,
+        Scorecard.bold_excitement,
+        Scorecard.score,
+        User.first_name,
+        User.last_name,
+    ).join(User, Scorecard.user_id == User.id).all()
+
+    # Returning the response directly skips re-validating our own rows against
+    # ScoreResponse; orjson serializes the dates as ISO strings
+    return ORJSONResponse([
+        {
+            "id": id_,
+            "date": date,
+            "company_name": company_name,
+            "sector": sector,
+            "investment_stage": investment_stage,
             # Individual scores at top level to match ScoreResponse model
-            "alignment": scorecard.alignment,
-            "team": scorecard.team,
-            "market": scorecard.market,
-            "product": scorecard.product,
-            "potential_return": scorecard.potential_return,
-            "bold_excitement": scorecard.bold_excitement,
-            "score": scorecard.score,
+            "alignment": alignment,
+            "team": team,
+            "market": market,
+            "product": product,
+            "potential_return": potential_return,
+            "bold_excitement": bold_excitement,
+            "score": score,
             "scored_by": {
-                "first_name": scorecard.scored_by.first_name if scorecard.scored_by else None,
-                "last_name": scorecard.scored_by.last_name if scorecard.scored_by else None,
+                "first_name": first_name,
+                "last_name": last_name,
             },
-            # Also keep scores dict for backward compatibility if needed
-            "scores": {
-                "alignment": scorecard.alignment,
-                "team": scorecard.team,
-                "market": scorecard.market,
-                "product": scorecard.product,
-                "potential_return": scorecard.potential_return,
-                "bold_excitement": scorecard.bold_excitement,
-            }
-        })
-    return response_data
+        }
+        for (
+            id_, date, company_name, sector, investment_stage,
+            alignment, team, market, product, potential_return, bold_excitement,
+            score, first_name, last_name,
+        ) in rows
+    ])
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # loop/http "auto" pick uvloop and httptools when they're installed. Stay on a
+    # single worker: the Dropbox sync queue and the caches are per process.
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        loop="auto",
+        http="auto",
+        access_log=os.getenv("ACCESS_LOG", "false").lower() == "true",
+        log_level="warning",
+    )